@@ -15,5 +15,12 @@ Modules:
 
 __version__ = "1.0.0"
 
+# Batch runs only save figures: select the non-GUI Agg backend before any chart
+# is drawn. Notebooks (and SPC_INTERACTIVE=1) keep their backend and show charts.
+import matplotlib as _matplotlib
+from .utils import INTERACTIVE as _INTERACTIVE
+if not _INTERACTIVE:
+    _matplotlib.use("Agg", force=True)
+
 # 可选的快捷导入（方便在 notebook 里直接用）
 from . import charts, metrics, panel, memory, utils
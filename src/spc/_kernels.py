@@ -0,0 +1,41 @@
+"""
+Numeric kernels: single-pass mean/std/OOC over a value series.
+Uses Numba when installed (pip install weekly-spc[fast]); otherwise numpy.
+"""
+
+from typing import Tuple
+import math
+import numpy as np
+
+def _mean_std_ooc_py(a: np.ndarray, ucl: float, lcl: float) -> Tuple[float, float, np.ndarray]:
+    """Welford mean + sample std (ddof=1) and indices of points outside [lcl, ucl], in one pass."""
+    n = a.shape[0]
+    ooc = np.empty(n, dtype=np.int64)
+    k = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        x = a[i]
+        d = x - mean
+        mean += d / (i + 1)
+        m2 += d * (x - mean)
+        if x > ucl or x < lcl:
+            ooc[k] = i
+            k += 1
+    std = math.sqrt(m2 / (n - 1)) if n > 1 else math.nan
+    return mean, std, ooc[:k]
+
+def _mean_std_ooc_np(a: np.ndarray, ucl: float, lcl: float) -> Tuple[float, float, np.ndarray]:
+    std = float(a.std(ddof=1)) if a.shape[0] > 1 else math.nan
+    return float(a.mean()), std, np.flatnonzero((a > ucl) | (a < lcl))
+
+try:
+    from numba import njit
+    _mean_std_ooc = njit(cache=True)(_mean_std_ooc_py)
+except ImportError:
+    _mean_std_ooc = _mean_std_ooc_np
+
+def mean_std_ooc(a: np.ndarray, ucl: float, lcl: float) -> Tuple[float, float, np.ndarray]:
+    """Returns (mean, std with ddof=1, OOC indices) of a 1-D series."""
+    mean, std, ooc = _mean_std_ooc(np.ascontiguousarray(a, dtype=np.float64), float(ucl), float(lcl))
+    return float(mean), float(std), ooc
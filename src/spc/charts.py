@@ -3,57 +3,123 @@ Chart orchestration: load data, compute SPC metrics, and render I‑MR panels.
 """
 
 import os
-import json
-from typing import List, Optional, Dict, Any
+from math import isfinite
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Any, Tuple, Callable, Union
 import numpy as np
-import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
+from openpyxl import load_workbook
 
-from .utils import get_ylabel
+from .utils import get_ylabel, INTERACTIVE
 from .metrics import sigma_to_risk, safe_sigma_text
 from .panel import render_text_panel, print_panel_lines
-from .memory import MemoryStore
+from .memory import MemoryStore, LastSigmaStore
 
 # ----------------- Memory management -----------------
-def _ensure_memory(results_dir: str) -> MemoryStore:
+# One MemoryStore per memory file, shared by every feature/product of a run.
+# Changes are kept in memory until flush_memory() is called; close_memory()
+# ends the run, so the next one re-reads files other runs may have changed.
+_MEM_CACHE: Dict[str, MemoryStore] = {}
+
+def _memory_path(results_dir: str) -> str:
     # Memory lives under .../Results/_memory_global/
     root_results = os.path.dirname(os.path.dirname(results_dir))
     mem_dir = os.path.join(root_results, "_memory_global")
     os.makedirs(mem_dir, exist_ok=True)
-    return MemoryStore(os.path.join(mem_dir, "spc_memory.json"))
+    return os.path.join(mem_dir, "spc_memory.json")
+
+def _ensure_memory(results_dir: str) -> MemoryStore:
+    path = _memory_path(results_dir)
+    if path not in _MEM_CACHE:
+        _MEM_CACHE[path] = MemoryStore(path)
+    return _MEM_CACHE[path]
+
+def flush_memory() -> None:
+    """Persist all cached MemoryStores and LastSigmaStores that have pending changes."""
+    try:
+        for mem in _MEM_CACHE.values():
+            mem.flush()
+    finally:
+        # Last sigma is independent of memory: persist it even if a memory flush fails
+        for store in _LAST_SIGMA_CACHE.values():
+            store.flush()
+
+def close_memory() -> None:
+    """flush_memory(), then drop the cached stores (end of a run)."""
+    try:
+        flush_memory()
+    finally:
+        _MEM_CACHE.clear()
+        _LAST_SIGMA_CACHE.clear()
 
 # ----------------- Last-sigma (persisted) -----------------
+# Same caching as MemoryStore: read once per run, written by flush_memory().
+_LAST_SIGMA_CACHE: Dict[str, LastSigmaStore] = {}
+
 def _last_sigma_store_path(results_dir: str) -> str:
     root_results = os.path.dirname(os.path.dirname(results_dir))
     mem_dir = os.path.join(root_results, "_memory_global")
     os.makedirs(mem_dir, exist_ok=True)
     return os.path.join(mem_dir, "last_sigma_simple.json")
 
-def _load_last_sigma(results_dir: str, product: str, feature: str):
+def _last_sigma_store(results_dir: str) -> LastSigmaStore:
     path = _last_sigma_store_path(results_dir)
-    if not os.path.exists(path):
-        return None
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get(f"{product}|{feature}")
-    except Exception:
-        return None
+    if path not in _LAST_SIGMA_CACHE:
+        _LAST_SIGMA_CACHE[path] = LastSigmaStore(path)
+    return _LAST_SIGMA_CACHE[path]
+
+def _load_last_sigma(results_dir: str, product: str, feature: str):
+    return _last_sigma_store(results_dir).get(product, feature)
 
 def _save_last_sigma(results_dir: str, product: str, feature: str, sigma: float) -> None:
-    path = _last_sigma_store_path(results_dir)
-    data = {}
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception:
-            data = {}
-    data[f"{product}|{feature}"] = float(sigma)
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+    _last_sigma_store(results_dir).set(product, feature, sigma)
+
+# ----------------- Excel input -----------------
+def _read_imr_excel(file_path: str):
+    """
+    Stream the first sheet in read-only mode.
+    Returns (ids, values, first_row): column 0, column 1 as float64 (rows with
+    an empty column 1 are skipped), and the first data row, which holds the
+    limits even if its column 1 is empty. The header row is skipped.
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()  # exporters often write a stale <dimension>; read every row like pandas did
+        rows = ws.iter_rows(values_only=True)
+        next(rows, None)  # header
+        first = None
+        ids: List[Any] = []
+        vals: List[float] = []
+        for r in rows:
+            if first is None:
+                first = r
+            if len(r) < 2 or r[1] is None:
+                continue
+            ids.append(r[0])
+            vals.append(float(r[1]))
+    finally:
+        wb.close()
+    return ids, np.fromiter(vals, dtype=np.float64, count=len(vals)), first
+
+def _limit_cell(row: Tuple[Any, ...], col: int) -> Any:
+    # openpyxl gives None for blank cells where pandas gave NaN (no spec limit)
+    v = row[col]
+    return float('nan') if v is None else v
+
+# ----------------- Figure -----------------
+def _new_imr_figure():
+    """I-MR chart on the left, text panel on the right."""
+    return plt.subplots(ncols=2, figsize=(14,6), gridspec_kw={'width_ratios':[3,2]})
+
+_SUBPLOT_PARAMS = ("left", "right", "bottom", "top", "wspace", "hspace")
+
+def _reset_layout(fig) -> None:
+    # tight_layout depends on the subplot params it starts from: undo the previous
+    # feature's layout so a reused figure saves exactly what a fresh one would
+    fig.subplots_adjust(**{k: plt.rcParams[f"figure.subplot.{k}"] for k in _SUBPLOT_PARAMS})
 
 # ----------------- X-axis -----------------
 def _apply_xaxis_with_blank(ax, n_points: int):
@@ -68,32 +134,61 @@ def _apply_xaxis_with_blank(ax, n_points: int):
     ax.set_xticks(ticks)
 
 # ================= I-MR =================
-def run_imr_spc(
+@dataclass
+class IMRResult:
+    """Outcome of one feature; memory/last-sigma updates are applied by the caller."""
+    product: str
+    feature: str
+    week: str
+    status: str                                   # "missing" | "accumulate" | "plotted" | "error"
+    ids: List[str] = field(default_factory=list)  # current week's points (for "accumulate")
+    values: List[float] = field(default_factory=list)
+    sigma: Optional[float] = None                 # plotted sigma level (for "plotted")
+    lines: List[str] = field(default_factory=list)  # console output
+
+def run_imr_spc_pure(
     file_path: str,
     display_name: str,
     results_dir: str,
     product_name: str = "",
     cfg: Optional[Dict[str, Any]] = None,
     need_ual_lal: bool = False,
-) -> None:
+    history: Union[Tuple[List[str], List[float]], Callable[[Optional[int]], Tuple[List[str], List[float]]]] = ([], []),
+    last_sigma: Optional[float] = None,
+    fig=None,
+    axes=None,
+) -> IMRResult:
+    """
+    Compute and plot one feature without touching memory or last-sigma files.
+    'history' is (weeks, values) of this feature's memory, oldest first,
+    excluding the current week, or a callable need -> (weeks, values) that
+    is only invoked when the current week has fewer than 'threshold' points.
+    If fig/axes are given (batch runs), the chart
+    is drawn on them, saved, and the axes are cleared for the next feature;
+    otherwise a new figure is created, saved, and closed (shown first under
+    IPython/Jupyter or with SPC_INTERACTIVE=1, see utils.INTERACTIVE).
+    """
+    week = os.path.basename(os.path.dirname(file_path))
+    product = product_name or "Product"
+    feature = display_name
+
     if not os.path.exists(file_path):
-        print(f"no data points in the {display_name}")
-        return
+        return IMRResult(product, feature, week, "missing", lines=[f"no data points in the {display_name}"])
 
     cfg = cfg or {}
     threshold = int(cfg.get("threshold", 20))
     history_strategy = (cfg.get("history_strategy") or "all").strip().lower()
     y_overrides: Optional[Dict[str, str]] = cfg.get("y_label_overrides") if isinstance(cfg.get("y_label_overrides"), dict) else None
+    dpi = int(cfg.get("dpi", 150))
+    image_format = (cfg.get("image_format") or "png").strip().lower().lstrip(".")
 
-    mem = _ensure_memory(results_dir)
-
-    df = pd.read_excel(file_path, sheet_name=0)
-    x = df.iloc[:, 0]
-    y = df.iloc[:, 1]
+    x, y, first = _read_imr_excel(file_path)
+    if not len(y):
+        return IMRResult(product, feature, week, "missing", lines=[f"no data points in the {display_name}"])
 
     # Use this week's limits from Excel
-    lsl = df.iloc[0, 31]; usl = df.iloc[0, 33]
-    lcl = df.iloc[0, 7];  ucl = df.iloc[0, 3]
+    lsl = _limit_cell(first, 31); usl = _limit_cell(first, 33)
+    lcl = _limit_cell(first, 7);  ucl = _limit_cell(first, 3)
     if lsl > usl: lsl, usl = usl, lsl
     if lcl > ucl: lcl, ucl = ucl, lcl
 
@@ -101,18 +196,11 @@ def run_imr_spc(
     ual = lal = None
     if need_ual_lal:
         try:
-            ual = df.iloc[0, 25]  # UAL
-            lal = df.iloc[0, 27]  # LAL
+            ual = _limit_cell(first, 25)  # UAL
+            lal = _limit_cell(first, 27)  # LAL
         except Exception:
             pass
 
-    week = os.path.basename(os.path.dirname(file_path))
-    product = product_name or "Product"
-    feature = display_name
-
-    # Read previously saved "last plotted sigma" (true previous)
-    last_plotted_sigma = _load_last_sigma(results_dir, product, feature)
-
     cur_vals = y.tolist()
 
     combined_vals: List[float] = cur_vals
@@ -121,32 +209,37 @@ def run_imr_spc(
 
     if len(cur_vals) < threshold:
         need = None if history_strategy != "fill_to_threshold" else max(threshold - len(cur_vals), 0)
-        weeks_used, hist_vals = mem.take_imr_until(product, feature, need=need, exclude_week=week)
+        if callable(history):
+            weeks_used, hist_vals = history(need)
+        else:
+            weeks_used, hist_vals = history
+            if need is not None:
+                weeks_used, hist_vals = weeks_used[:need], hist_vals[:need]
         used_hist_vals = hist_vals
         used_hist_weeks = weeks_used
         combined_vals = hist_vals + cur_vals
         if len(combined_vals) < threshold:
-            mem.add_imr_points(
-                product, feature, week,
-                ids=list(map(str, x.tolist())),
-                values=cur_vals
+            return IMRResult(
+                product, feature, week, "accumulate",
+                ids=list(map(str, x)),
+                values=cur_vals,
+                lines=[
+                    f"Accumulating '{product} | {feature}': "
+                    f"current({len(cur_vals)}) + history({len(hist_vals)}) "
+                    f"= {len(combined_vals)}/{threshold} points. No chart yet."
+                ],
             )
-            print(
-                f"Accumulating '{product} | {feature}': "
-                f"current({len(cur_vals)}) + history({len(hist_vals)}) "
-                f"= {len(combined_vals)}/{threshold} points. No chart yet."
-            )
-            return
+
+    from ._kernels import mean_std_ooc  # Numba-compiled on first use when available
 
     y_series = np.asarray(combined_vals, dtype=float)
-    mean = y_series.mean()
-    std  = y_series.std(ddof=1)
+    mean, std, ooc_idx = mean_std_ooc(y_series, ucl, lcl)
     cp   = (usl - lsl) / (6 * std) if std > 0 else float('inf')
     cpk  = min((usl - mean)/(3*std), (mean - lsl)/(3*std)) if std > 0 else float('inf')
-    sigma_level = round(cpk * 3, 3) if np.isfinite(cpk) else float('inf')
+    sigma_level = round(cpk * 3, 3) if isfinite(cpk) else float('inf')
     risk_level  = sigma_to_risk(sigma_level)
 
-    last_sigma_text = safe_sigma_text(last_plotted_sigma)
+    last_sigma_text = safe_sigma_text(last_sigma)
 
     if used_hist_weeks:
         hist_range = (
@@ -157,9 +250,10 @@ def run_imr_spc(
     else:
         note_src = f"Data source: current({len(cur_vals)}) from {week}"
 
-    ooc_mask = (y_series > ucl) | (y_series < lcl)
-    ooc_ids  = [i+1 for i, flag in enumerate(ooc_mask) if flag]
-    x_plot   = list(range(1, len(y_series) + 1))
+    ooc_mask = np.zeros(len(y_series), dtype=bool)
+    ooc_mask[ooc_idx] = True
+    ooc_ids  = (ooc_idx + 1).tolist()
+    x_plot   = np.arange(1, len(y_series) + 1)
 
     summary_lines = [
         f"--- {feature} (I-MR SPC) ---",
@@ -177,17 +271,17 @@ def run_imr_spc(
         note_src,
         f"OOC points: {ooc_ids if ooc_ids else 'None'}"
     ]
-    print(); print_panel_lines(summary_lines)
 
     # Plot
-    fig, (ax_plot, ax_text) = plt.subplots(ncols=2, figsize=(14,6), gridspec_kw={'width_ratios':[3,2]})
-    ok_x  = [i for i in x_plot if i not in ooc_ids]
-    ok_y  = [y_series[i-1] for i in ok_x]
-    ooc_y = [y_series[i-1] for i in ooc_ids]
-    ax_plot.scatter(ok_x, ok_y, color='black')
-    if ooc_ids:
-        ax_plot.scatter(ooc_ids, ooc_y, color='red')
-    ax_plot.plot(x_plot, y_series, linestyle='--', color='black', alpha=0.7)
+    reuse_fig = fig is not None
+    if reuse_fig:
+        ax_plot, ax_text = axes
+        _reset_layout(fig)
+    else:
+        fig, (ax_plot, ax_text) = _new_imr_figure()
+    # One collection for all points (OOC in red); rasterized to keep vector exports light
+    ax_plot.scatter(x_plot, y_series, c=np.where(ooc_mask, 'red', 'black'), rasterized=True)
+    ax_plot.plot(x_plot, y_series, linestyle='--', color='black', alpha=0.7, rasterized=True)
     ax_plot.axhline(mean, color='green', linestyle='--',  label='Mean')
     ax_plot.axhline(ucl, color='red', linestyle='-.', label='UCL')
     ax_plot.axhline(lcl, color='red', linestyle='-.', label='LCL')
@@ -205,29 +299,160 @@ def run_imr_spc(
     render_text_panel(ax_text, summary_lines)
     fig.tight_layout()
     os.makedirs(results_dir, exist_ok=True)
-    fig.savefig(os.path.join(results_dir, feature + ".png"), dpi=300, bbox_inches='tight')
-    plt.show(); plt.close(fig)
+    # bbox_inches='tight' stays: long text-panel lines overflow the figure and would be clipped
+    fig.savefig(os.path.join(results_dir, f"{feature}.{image_format}"), dpi=dpi, bbox_inches='tight')
+    if reuse_fig:
+        ax_plot.cla(); ax_text.cla()
+    else:
+        if INTERACTIVE:
+            plt.show()
+        plt.close(fig)
 
-    # Persist the sigma we just plotted → becomes "Last Sigma" for the next run
-    _save_last_sigma(results_dir, product, feature, sigma_level)
+    return IMRResult(product, feature, week, "plotted", sigma=sigma_level, lines=summary_lines)
 
-    # Per rule: clear feature memory after plotting with ≥threshold combined points
-    mem.clear_feature(product, feature)
+def _run_imr_safe(fig=None, axes=None, **kwargs) -> IMRResult:
+    """run_imr_spc_pure, with a failing feature reported as status "error" instead of raised."""
+    try:
+        return run_imr_spc_pure(fig=fig, axes=axes, **kwargs)
+    except Exception as exc:
+        if axes is not None:
+            for ax in axes:
+                ax.cla()
+        return _imr_error(kwargs, exc)
+
+def _imr_error(kwargs: Dict[str, Any], exc: BaseException) -> IMRResult:
+    file_path = kwargs["file_path"]
+    week = os.path.basename(os.path.dirname(file_path))
+    product = kwargs.get("product_name") or "Product"
+    feature = kwargs["display_name"]
+    return IMRResult(product, feature, week, "error", lines=[
+        f"Failed '{product} | {feature}' ({file_path}): {type(exc).__name__}: {exc}"
+    ])
+
+def _apply_imr_result(res: IMRResult, results_dir: str) -> None:
+    """Print the feature's console output and apply its memory/last-sigma updates."""
+    if res.status == "plotted":
+        print()
+    print_panel_lines(res.lines)
+    if res.status == "accumulate":
+        _ensure_memory(results_dir).add_imr_points(
+            res.product, res.feature, res.week,
+            ids=res.ids,
+            values=res.values
+        )
+    elif res.status == "plotted":
+        # Persist the sigma we just plotted → becomes "Last Sigma" for the next run
+        _save_last_sigma(results_dir, res.product, res.feature, res.sigma)
+
+        # Per rule: clear feature memory after plotting with ≥threshold combined points
+        _ensure_memory(results_dir).clear_feature(res.product, res.feature)
+
+class _UnavailableHistory:
+    """Worker 'history' whose memory snapshot failed: raises only if the feature needs history."""
+    def __init__(self, exc: Exception):
+        self.exc = exc
+
+    def __call__(self, need: Optional[int]) -> Tuple[List[str], List[float]]:
+        raise self.exc
+
+def _imr_inputs(file_path: str, display_name: str, results_dir: str, product_name: str, lazy: bool = True) -> Dict[str, Any]:
+    """
+    Memory history and last sigma of one feature, as run_imr_spc_pure arguments.
+    lazy=True (in-process runs) defers memory access until history is needed;
+    worker processes get a snapshot instead.
+    """
+    week = os.path.basename(os.path.dirname(file_path))
+    product = product_name or "Product"
+
+    def history(need: Optional[int]) -> Tuple[List[str], List[float]]:
+        return _ensure_memory(results_dir).take_imr_until(product, display_name, need=need, exclude_week=week)
+
+    hist: Any = history
+    if not lazy:
+        try:
+            hist = history(None)
+        except Exception as exc:  # e.g. unreadable memory values: fail this feature in its worker
+            hist = _UnavailableHistory(exc)
+
+    return {
+        "history": hist,
+        # Previously saved "last plotted sigma" (true previous)
+        "last_sigma": _load_last_sigma(results_dir, product, display_name),
+    }
+
+def run_imr_spc(
+    file_path: str,
+    display_name: str,
+    results_dir: str,
+    product_name: str = "",
+    cfg: Optional[Dict[str, Any]] = None,
+    need_ual_lal: bool = False,
+    fig=None,
+    axes=None,
+    flush: bool = True,
+) -> None:
+    """
+    Run one feature in-process and apply its updates. Memory and last sigma are
+    written before returning unless flush=False, in which case the caller
+    persists them with close_memory() (batch runs).
+    """
+    try:
+        res = run_imr_spc_pure(
+            file_path, display_name, results_dir,
+            product_name=product_name,
+            cfg=cfg,
+            need_ual_lal=need_ual_lal,
+            fig=fig,
+            axes=axes,
+            **_imr_inputs(file_path, display_name, results_dir, product_name),
+        )
+        _apply_imr_result(res, results_dir)
+    finally:
+        if flush:
+            close_memory()
+
+# ----------------- Worker processes -----------------
+_WORKER_FIG = None
+
+def _init_worker() -> None:
+    # Workers only save figures: no GUI backend, one reusable figure per process
+    global _WORKER_FIG
+    matplotlib.use("Agg")
+    _WORKER_FIG = _new_imr_figure()
+
+def _run_imr_job(kwargs: Dict[str, Any]) -> IMRResult:
+    fig, axes = _WORKER_FIG
+    return _run_imr_safe(fig=fig, axes=axes, **kwargs)
+
+def _job_result(fut, kwargs: Dict[str, Any]) -> IMRResult:
+    try:
+        return fut.result()
+    except Exception as exc:  # e.g. a worker process died
+        return _imr_error(kwargs, exc)
 
 # ================= Batch entry from config =================
 def run_product(product_name: str, data_dir: str, results_dir: str, imr_files: list[str]) -> None:
     # Backward compatibility for legacy callers (without YAML): unchanged
     os.makedirs(results_dir, exist_ok=True)
     print(f"\n===== RUNNING PRODUCT: {product_name} =====")
-    for fname in imr_files:
-        from_path = os.path.join(data_dir, fname + ".xlsx")
-        run_imr_spc(from_path, fname, results_dir, product_name=product_name)
+    try:
+        for fname in imr_files:
+            from_path = os.path.join(data_dir, fname + ".xlsx")
+            run_imr_spc(from_path, fname, results_dir, product_name=product_name, flush=False)
+    finally:
+        # Keep the updates of the features that ran, even if a later one raised
+        close_memory()
 
 def run_from_config(week: str, cfg: Dict[str, Any]) -> None:
     data_root = cfg.get("data_root") or r"C:\\Users\\Hancheng_Wang\\Desktop\\Hancheng\\SPD\\Weekly SPC Monitor Report\\Data"
     result_root = cfg.get("result_root") or r"C:\\Users\\Hancheng_Wang\\Desktop\\Hancheng\\SPD\\Weekly SPC Monitor Report\\Results"
     products = cfg.get("products") or []
+    max_workers = int(cfg.get("max_workers") or 0) or os.cpu_count() or 1
+    n_features = sum(len(prod.get("features") or []) for prod in products)
+    use_pool = not INTERACTIVE and max_workers > 1 and n_features > 1
 
+    # Per product: (name, results_dir, run_imr_spc_pure kwargs of each feature), in config order
+    batches: List[Tuple[str, str, List[Dict[str, Any]]]] = []
     for prod in products:
         name = prod.get("name") or "Product"
         data_subdir = prod.get("data_subdir") or name
@@ -236,17 +461,66 @@ def run_from_config(week: str, cfg: Dict[str, Any]) -> None:
         data_dir = os.path.join(data_root, data_subdir, week)
         results_dir = os.path.join(result_root, results_subdir, week)
         os.makedirs(results_dir, exist_ok=True)
-        print(f"\n===== RUNNING PRODUCT: {name} =====")
+        jobs = []
         for f in features:
             display_name = f.get("display_name") or f.get("file_stem")
             stem = f.get("file_stem") or display_name
             need_ual_lal = bool(f.get("need_ual_lal", False))
             from_path = os.path.join(data_dir, stem + ".xlsx")
-            run_imr_spc(
-                from_path,
-                display_name,
-                results_dir,
+            jobs.append(dict(
+                file_path=from_path,
+                display_name=display_name,
+                results_dir=results_dir,
                 product_name=name,
                 cfg=cfg,
                 need_ual_lal=need_ual_lal,
-            )
+                **_imr_inputs(from_path, display_name, results_dir, name, lazy=not use_pool),
+            ))
+        batches.append((name, results_dir, jobs))
+
+    all_jobs = [kwargs for _, _, jobs in batches for kwargs in jobs]
+    # Results are produced lazily, in config order, and applied one by one below;
+    # a failing feature becomes an "error" result, the others still update memory,
+    # and the run raises once all of them are done.
+    pool = fig = None
+    if INTERACTIVE:
+        # Debugging: in-process, one shown figure per feature
+        results = (_run_imr_safe(**kwargs) for kwargs in all_jobs)
+    elif use_pool:
+        # Features are independent: compute/plot in workers, apply updates here in config order
+        pool = ProcessPoolExecutor(max_workers=min(max_workers, len(all_jobs)), initializer=_init_worker)
+        futures = [pool.submit(_run_imr_job, kwargs) for kwargs in all_jobs]
+        results = (_job_result(fut, kwargs) for fut, kwargs in zip(futures, all_jobs))
+    else:
+        # One figure for the whole batch: features are drawn, saved, and cleared in turn
+        fig, axes = _new_imr_figure()
+        results = (_run_imr_safe(fig=fig, axes=axes, **kwargs) for kwargs in all_jobs)
+
+    failed: List[IMRResult] = []
+    flush_error: Optional[Exception] = None
+    try:
+        for name, results_dir, jobs in batches:
+            print(f"\n===== RUNNING PRODUCT: {name} =====")
+            for _ in jobs:
+                res = next(results)
+                _apply_imr_result(res, results_dir)
+                if res.status == "error":
+                    failed.append(res)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if fig is not None:
+            plt.close(fig)
+        try:
+            close_memory()
+        except Exception as exc:
+            if not failed:
+                raise
+            flush_error = exc  # reported with the feature failures below
+
+    # The other features' charts and memory are saved; still fail the run (non-zero exit for the CLI)
+    if failed:
+        message = f"{len(failed)} feature(s) failed:\n" + "\n".join(line for res in failed for line in res.lines)
+        if flush_error is not None:
+            message += f"\nMemory was not saved: {flush_error}"
+        raise RuntimeError(message) from flush_error
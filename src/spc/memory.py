@@ -1,10 +1,15 @@
 """
-JSON‑backed cross‑week memory for I‑MR accumulation and cleanup.
+JSON/npz‑backed cross‑week memory for I‑MR accumulation and cleanup.
 """
 
-import json
 import os
-from typing import Dict, List, Any, Tuple, Optional
+import math
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Tuple, Optional, Set
+import numpy as np
+
+from .utils import json_dumps, json_loads, read_json, write_json_atomic, write_bytes_atomic, content_hash
 
 Record = Dict[str, Any]
 
@@ -20,35 +25,225 @@ I-MR memory only accumulates single-point values.
 Memory keys follow the format "<product>|<feature>", and different products/features are independent of each other.
 """
 
+@dataclass
+class _Bucket:
+    """Columnar I-MR points of one key, ordered by (week, numeric id)."""
+    weeks: np.ndarray = field(default_factory=lambda: np.array([], dtype=str))
+    ids: np.ndarray = field(default_factory=lambda: np.array([], dtype=str))
+    values: np.ndarray = field(default_factory=lambda: np.array([], dtype=np.float64))
+    _seen: Optional[Set[Tuple[str, str]]] = None  # (week, id) already stored; built on first add
+
+    @classmethod
+    def from_records(cls, records: List[Record]) -> "_Bucket":
+        imr = [r for r in records if r.get("type") == "IMR"]
+        weeks = np.asarray([r.get("week", "") for r in imr], dtype=str)
+        ids = np.asarray([str(r.get("id", 0)) for r in imr], dtype=str)
+        values = np.asarray([float(r["value"]) for r in imr], dtype=np.float64)
+        # Order by week, then numeric id (avoid "1,10,11,2" string-order issue)
+        order = np.lexsort((ids.astype(np.int64), weeks))
+        return cls.from_columns(weeks[order], ids[order], values[order])
+
+    @classmethod
+    def from_columns(cls, weeks: List[str], ids: List[str], values: np.ndarray) -> "_Bucket":
+        """Columns already in bucket order (as written by MemoryStore._save)."""
+        return cls(np.asarray(weeks, dtype=str), np.asarray(ids, dtype=str), np.asarray(values, dtype=np.float64))
+
+    @property
+    def seen(self) -> Set[Tuple[str, str]]:
+        # Read-only keys (take_imr_until) never pay for per-point tuples
+        if self._seen is None:
+            self._seen = set(zip(self.weeks.tolist(), self.ids.tolist()))
+        return self._seen
+
+    def insert(self, week: str, ids: List[str], values: List[float]) -> None:
+        """
+        Insert new points of one week. Only that week's contiguous block is
+        re-ordered (by numeric id); the rest of the bucket is not re-sorted.
+        """
+        lo = int(np.searchsorted(self.weeks, week, side="left"))
+        hi = int(np.searchsorted(self.weeks, week, side="right"))
+        blk_ids = np.concatenate([self.ids[lo:hi], np.asarray(ids, dtype=str)])
+        blk_vals = np.concatenate([self.values[lo:hi], np.asarray(values, dtype=np.float64)])
+        order = np.argsort(blk_ids.astype(np.int64), kind="stable")
+        self.weeks = np.concatenate([self.weeks[:lo], np.full(len(blk_ids), week), self.weeks[hi:]])
+        self.ids = np.concatenate([self.ids[:lo], blk_ids[order], self.ids[hi:]])
+        self.values = np.concatenate([self.values[:lo], blk_vals[order], self.values[hi:]])
+        self.seen.update((week, i) for i in ids)
+
 class MemoryStore:
     """
-    JSON-backed memory keyed by "<product>|<feature>".
+    JSON/npz-backed memory keyed by "<product>|<feature>".
 
-    I-MR single point record:
+    The JSON file holds per-key metadata; the float values live in a
+    compressed npz sidecar next to it, one array per key:
+    {"format":"npz","values_file":"spc_memory.<token>.npz","content_hash":"...",
+     "keys":{"<product>|<feature>":{"array":"a0","weeks":[...],"ids":[...]}}}
+    Each flush writes a new sidecar and then atomically replaces the JSON
+    that names it, so the two files never disagree. If the content hash of
+    keys + values is unchanged, nothing is rewritten. A missing or unreadable
+    sidecar raises instead of dropping the keys it should hold; the error says
+    how to recover (restore the sidecar, or delete the JSON).
+
+    Older files holding I-MR single point records are still read:
     {"type":"IMR","week":"YYYYMMDD-YYYYMMDD","id":"first column","value":float}
+    Such keys are converted one by one; a key whose records cannot be
+    converted only fails when accessed, and is written back unchanged under
+    "legacy" so that its history is kept.
+
+    Keys are converted to a columnar _Bucket on first access. Until flush()
+    every change is appended to "<json_path>.wal" (one JSON line per added
+    point or cleared key), which
+    is replayed on load if a run ended before flushing; points of keys still
+    in the sidecar are held back until that key is first accessed, so a bad
+    sidecar only fails the keys that need it.
     """
     def __init__(self, json_path: str):
         self.json_path = json_path
-        self.data: Dict[str, List[Record]] = {}
+        self.wal_path = json_path + ".wal"
+        # npz metadata of keys not yet converted to buckets
+        self.data: Dict[str, Any] = {}
+        # Record lists of keys from a legacy file not yet converted to buckets
+        self._legacy: Dict[str, List[Record]] = {}
+        self._values_file: Optional[str] = None
+        self._content_hash: Optional[str] = None
+        self._buckets: Dict[str, _Bucket] = {}
+        # Replayed WAL points of keys still in self.data: (week, id, value)
+        self._deferred: Dict[str, List[Tuple[str, Any, float]]] = {}
+        self._dirty = False
         os.makedirs(os.path.dirname(json_path), exist_ok=True)
         if os.path.exists(json_path):
             try:
-                with open(json_path, "r", encoding="utf-8") as f:
-                    self.data = json.load(f)
+                raw = read_json(json_path)
+                if raw.get("format") == "npz":
+                    self.data = raw.get("keys") or {}
+                    self._legacy = raw.get("legacy") or {}
+                    self._values_file = raw.get("values_file")
+                    self._content_hash = raw.get("content_hash")
+                else:
+                    self._legacy = dict(raw)
             except Exception:
                 self.data = {}
+                self._legacy = {}
+        self._replay_wal()
+
+    def _values_stem(self) -> str:
+        return os.path.splitext(os.path.basename(self.json_path))[0]
+
+    def _materialize(self, keys: List[str]) -> None:
+        """
+        Convert the given keys from self._legacy or self.data into buckets, reading
+        the npz sidecar once. Raises if a legacy key cannot be converted (it stays
+        in self._legacy) or if the sidecar cannot be read; the keys then stay in
+        self.data, and flush() refuses to write (the WAL keeps this run's changes).
+        """
+        for k in keys:
+            if k in self._legacy:
+                try:
+                    self._buckets[k] = _Bucket.from_records(self._legacy[k])
+                except Exception as exc:
+                    raise RuntimeError(f"Cannot convert memory key {k!r} of {self.json_path}: {exc}") from exc
+                del self._legacy[k]
+        pending = {k: self.data[k] for k in keys if k in self.data}
+        if not pending:
+            return
+        npz_path = os.path.join(os.path.dirname(self.json_path), self._values_file or "")
+        try:
+            with np.load(npz_path, allow_pickle=False) as z:
+                arrays = {k: z[m["array"]] for k, m in pending.items()}
+        except Exception as exc:
+            raise RuntimeError(
+                f"Cannot read memory values of {self.json_path} from {npz_path} ({exc}). "
+                f"Restore {os.path.basename(npz_path)}, or delete {os.path.basename(self.json_path)} to drop "
+                f"the history it holds; the changes logged in {os.path.basename(self.wal_path)} are kept either way."
+            ) from exc
+        for k, m in pending.items():
+            self._buckets[k] = _Bucket.from_columns(m.get("weeks", []), m.get("ids", []), arrays[k])
+            del self.data[k]
+            for week, i, v in self._deferred.pop(k, ()):
+                self._add(k, week, [i], [v])
 
     def _save(self) -> None:
-        os.makedirs(os.path.dirname(self.json_path), exist_ok=True)
-        tmp = self.json_path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, self.json_path)
+        mem_dir = os.path.dirname(self.json_path)
+        os.makedirs(mem_dir, exist_ok=True)
+        old_values_file = self._values_file
+        self._materialize(list(self.data))
+        for k in list(self._legacy):
+            try:
+                self._materialize([k])
+            except RuntimeError:
+                pass  # kept as records below
+        arrays: Dict[str, np.ndarray] = {}
+        keys: Dict[str, Any] = {}
+        # Sorted keys: the content hash must not depend on access order
+        for n, k in enumerate(sorted(k for k, b in self._buckets.items() if len(b.values))):
+            b = self._buckets[k]
+            arrays[f"a{n}"] = b.values
+            keys[k] = {"array": f"a{n}", "weeks": b.weeks.tolist(), "ids": b.ids.tolist()}
+        legacy = {k: self._legacy[k] for k in sorted(self._legacy)}
+        digest = content_hash(json_dumps([keys, legacy], indent=False) + b"".join(a.tobytes() for a in arrays.values()))
+        if (digest == self._content_hash and self._values_file
+                and os.path.exists(os.path.join(mem_dir, self._values_file))):
+            return  # same content as on disk
+        stem = self._values_stem()
+        values_file = f"{stem}.{uuid.uuid4().hex[:12]}.npz"
+        np.savez_compressed(os.path.join(mem_dir, values_file), **arrays)
+        payload = {"format": "npz", "values_file": values_file, "content_hash": digest, "keys": keys}
+        if legacy:
+            payload["legacy"] = legacy
+        write_json_atomic(self.json_path, payload)
+        self._values_file = values_file
+        self._content_hash = digest
+        # Drop only the sidecar this store was loaded from: any other one may be
+        # named by a JSON another process is about to write
+        if old_values_file and old_values_file != values_file:
+            try:
+                os.remove(os.path.join(mem_dir, old_values_file))
+            except FileNotFoundError:
+                pass
+
+    def flush(self) -> None:
+        """Write pending changes to disk (atomic replace) and drop the WAL; no-op if nothing changed."""
+        if not self._dirty:
+            return
+        self._save()
+        if os.path.exists(self.wal_path):
+            os.remove(self.wal_path)
+        self._dirty = False
+
+    # ---------- WAL ----------
+    def _log(self, entries: List[Dict[str, Any]]) -> None:
+        with open(self.wal_path, "ab") as f:
+            f.write(b"".join(json_dumps(e, indent=False) + b"\n" for e in entries))
+
+    def _replay_wal(self) -> None:
+        if not os.path.exists(self.wal_path):
+            return
+        with open(self.wal_path, "rb") as f:
+            for line in f:
+                try:
+                    e = json_loads(line)
+                except Exception:
+                    continue  # torn last line
+                if e.get("clear"):
+                    self._clear(e["key"])
+                elif e["key"] in self._legacy:
+                    self._legacy[e["key"]].append({"type": "IMR", "week": e["week"], "id": e["id"], "value": e["value"]})
+                elif e["key"] in self.data:
+                    self._deferred.setdefault(e["key"], []).append((e["week"], e["id"], e["value"]))
+                else:
+                    self._add(e["key"], e["week"], [e["id"]], [e["value"]])
+        self._dirty = True
 
     @staticmethod
     def _key(product: str, feature: str) -> str:
         return f"{product}|{feature}"
 
+    def _bucket(self, key: str) -> _Bucket:
+        """Columnar view of a key, converted from the loaded file on first access."""
+        if key not in self._buckets:
+            self._materialize([key])
+        return self._buckets.setdefault(key, _Bucket())
+
     # ---------- IMR ----------
     def add_imr_points(
         self,
@@ -60,15 +255,26 @@ class MemoryStore:
     ) -> None:
         """Add current week's IMR points into memory; deduplicate by (week, id)."""
         key = self._key(product, feature)
-        bucket = self.data.setdefault(key, [])
-        seen = {(r.get("week"), str(r.get("id"))) for r in bucket if r.get("type") == "IMR"}
+        new_ids, new_vals = self._add(key, week, ids, values)
+        if new_ids:
+            self._log([{"key": key, "week": week, "id": i, "value": v} for i, v in zip(new_ids, new_vals)])
+            self._dirty = True
+
+    def _add(self, key: str, week: str, ids: List[Any], values: List[float]) -> Tuple[List[str], List[float]]:
+        """Insert points not yet in the bucket; returns the ones actually added."""
+        bucket = self._bucket(key)
+        new_ids: List[str] = []
+        new_vals: List[float] = []
+        added = set()
         for i, v in zip(ids, values):
             tag = (week, str(i))
-            if tag not in seen:
-                bucket.append({"type": "IMR", "week": week, "id": str(i), "value": float(v)})
-        # Order by type, then week, then numeric id (avoid "1,10,11,2" string-order issue)
-        bucket.sort(key=lambda r: (r.get("type", ""), r.get("week", ""), int(r.get("id", 0))))
-        self._save()
+            if tag not in bucket.seen and tag not in added:
+                added.add(tag)
+                new_ids.append(str(i))
+                new_vals.append(float(v))
+        if new_ids:
+            bucket.insert(week, new_ids, new_vals)
+        return new_ids, new_vals
 
     def take_imr_until(
         self,
@@ -83,24 +289,68 @@ class MemoryStore:
         - Else: take up to 'need' points.
         Returns (weeks_used_in_order, values_oldest_first); does not delete original data.
         """
-        key = self._key(product, feature)
-        weeks: List[str] = []
-        vals: List[float] = []
-        for r in self.data.get(key, []):
-            if r.get("type") != "IMR":
-                continue
-            if exclude_week and r.get("week") == exclude_week:
-                continue
-            weeks.append(r["week"])
-            vals.append(float(r["value"]))
-            if need is not None and len(vals) >= need:
-                break
-        return weeks, vals
+        bucket = self._bucket(self._key(product, feature))
+        if exclude_week:
+            idx = np.flatnonzero(bucket.weeks != exclude_week)
+        else:
+            idx = np.arange(len(bucket.values))
+        if need is not None:
+            idx = idx[:need]
+        return bucket.weeks[idx].tolist(), bucket.values[idx].tolist()
 
     # ---------- Clear ----------
     def clear_feature(self, product: str, feature: str) -> None:
         """Clear all memory records for the given product|feature key."""
         key = self._key(product, feature)
-        if key in self.data:
-            del self.data[key]
-            self._save()
+        if self._clear(key):
+            self._log([{"key": key, "clear": True}])
+            self._dirty = True
+
+    def _clear(self, key: str) -> bool:
+        """Drop a key; returns whether it held any points."""
+        records = self.data.pop(key, None)
+        legacy = self._legacy.pop(key, None)
+        deferred = self._deferred.pop(key, None)
+        bucket = self._buckets.pop(key, None)
+        return bool(records) or bool(legacy) or bool(deferred) or (bucket is not None and len(bucket.values) > 0)
+
+class LastSigmaStore:
+    """
+    Last plotted sigma level per "<product>|<feature>" (shown as "Last Sigma").
+    Read once on construction; set() only updates memory until flush(),
+    which skips the write when the serialized content is unchanged.
+    """
+    def __init__(self, json_path: str):
+        self.json_path = json_path
+        self.data: Dict[str, float] = {}
+        self._dirty = False
+        self._content_hash: Optional[str] = None
+        if os.path.exists(json_path):
+            try:
+                with open(json_path, "rb") as f:
+                    raw = f.read()
+                self.data = json_loads(raw)
+                self._content_hash = content_hash(raw)
+            except Exception:
+                self.data = {}
+
+    def get(self, product: str, feature: str) -> Optional[float]:
+        return self.data.get(MemoryStore._key(product, feature))
+
+    def set(self, product: str, feature: str, sigma: float) -> None:
+        self.data[MemoryStore._key(product, feature)] = float(sigma)
+        self._dirty = True
+
+    def flush(self) -> None:
+        """Write pending changes to disk (atomic replace); no-op if nothing changed."""
+        if not self._dirty:
+            return
+        # orjson cannot write inf (sigma of a zero-spread series)
+        finite = all(math.isfinite(v) for v in self.data.values() if v is not None)
+        payload = json_dumps(self.data, allow_nan=not finite)
+        digest = content_hash(payload)
+        if digest != self._content_hash:
+            os.makedirs(os.path.dirname(self.json_path), exist_ok=True)
+            write_bytes_atomic(self.json_path, payload)
+            self._content_hash = digest
+        self._dirty = False
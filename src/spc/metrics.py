@@ -2,19 +2,26 @@
 Statistical helpers: sigma, Cp/Cpk, control limits, and safe text.
 """
 
+from math import isfinite
 from typing import Optional
 import numpy as np
 
+# Risk bands: sigma < 3.0 → "High risk", 3.0 ≤ sigma < 4.0 → "Poor", ..., sigma ≥ 6.0 → "Excellent"
+_RISK_THRESHOLDS = np.array([3.0, 4.0, 4.5, 5.0, 6.0])
+_RISK_LABELS = ("High risk", "Poor", "Moderate", "Acceptable", "Good", "Excellent")
+_RISK_LABELS_ARR = np.array(_RISK_LABELS)
+
 def sigma_to_risk(sigma: float) -> str:
-    if not np.isfinite(sigma): return "N/A"
-    if sigma < 3.0:  return "High risk"
-    if sigma < 4.0:  return "Poor"
-    if sigma < 4.5:  return "Moderate"
-    if sigma < 5.0:  return "Acceptable"
-    if sigma < 6.0:  return "Good"
-    return "Excellent"
+    if not isfinite(sigma): return "N/A"
+    return _RISK_LABELS[int(np.searchsorted(_RISK_THRESHOLDS, sigma, side="right"))]
+
+def sigma_to_risk_array(sigma: np.ndarray) -> np.ndarray:
+    """Vectorized sigma_to_risk; non-finite entries map to "N/A"."""
+    sigma = np.asarray(sigma, dtype=float)
+    idx = np.searchsorted(_RISK_THRESHOLDS, sigma, side="right")
+    return np.where(np.isfinite(sigma), _RISK_LABELS_ARR[idx], "N/A")
 
 def safe_sigma_text(val: Optional[float]) -> str:
     if val is None: return "N/A"
-    if not np.isfinite(val): return "inf"
+    if not isfinite(val): return "inf"
     return f"{val:.3f}"
@@ -1,13 +1,12 @@
 # src/spc/run_week.py
 from typing import Optional
-import yaml
 from spc import charts
+from spc.utils import load_config
 
 def run_week(week: str, cfg_path: Optional[str] = "spc_config.yaml") -> None:
     cfg = {}
     if cfg_path:
-        with open(cfg_path, "r", encoding="utf-8") as f:
-            cfg = yaml.safe_load(f) or {}
+        cfg = load_config(cfg_path)
     charts.run_from_config(week=week, cfg=cfg)
 
 if __name__ == "__main__":
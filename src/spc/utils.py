@@ -1,11 +1,61 @@
 """
-Utilities: week parsing, X‑axis ticks, and Y‑axis label mapping.
+Utilities: config loading, week parsing, X‑axis ticks, Y‑axis label mapping, and JSON files.
 """
 
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, List, Dict, Any
 import os
+import re
+import sys
+import copy
+import json
+import hashlib
 from datetime import datetime, timedelta
+from functools import lru_cache
 import matplotlib.pyplot as plt
+import yaml
+
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml-backed, much faster
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+def _interactive() -> bool:
+    """
+    Whether charts are shown (default Matplotlib backend, one figure per feature).
+    SPC_INTERACTIVE=1/0 forces it on/off; otherwise it is on under IPython/Jupyter,
+    so notebook runs keep their inline charts, and off for batch runs.
+    """
+    flag = os.environ.get("SPC_INTERACTIVE")
+    if flag in ("0", "1"):
+        return flag == "1"
+    ipython = sys.modules.get("IPython")  # only loaded when running under IPython
+    return ipython is not None and ipython.get_ipython() is not None
+
+INTERACTIVE = _interactive()
+
+try:
+    import orjson
+except ImportError:  # optional: pip install weekly-spc[fast]
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:  # optional: pip install weekly-spc[fast]
+    xxhash = None
+
+# ----------------- Config -----------------
+@lru_cache(maxsize=8)
+def _load_config(path: str, mtime: float) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=_YamlLoader) or {}
+
+def load_config(path: str) -> Dict[str, Any]:
+    """
+    Parse a YAML config; cached until the file's mtime changes.
+    Returns a copy, so callers may modify it freely.
+    """
+    path = os.path.abspath(path)
+    return copy.deepcopy(_load_config(path, os.path.getmtime(path)))
 
 def parse_week_range(folder_name: str) -> Tuple[Optional[str], Optional[str]]:
     """'YYYYMMDD-YYYYMMDD' -> (start_str, end_str) or (None, None) if invalid."""
@@ -48,15 +98,64 @@ def apply_xaxis(ax: plt.Axes, n: int) -> None:
     ax.set_xlim(1, xmax)
     ax.set_xticks(ticks)
 
-def get_ylabel(display_name: str, overrides: Optional[Dict[str, str]] = None) -> str:
-    if overrides:
-        # case-insensitive exact match
-        for k, v in overrides.items():
-            if k.strip().lower() == display_name.strip().lower():
-                return v
-    name = display_name.lower()
-    if "pl" in name: return "PL (nm)"
-    if "mesa" in name and "width" in name: return "Mesa Width (\u03bcm)"
-    if "etch" in name or "depth" in name: return "Mesa Depth (\u03bcm)"
-    if "thickness" in name: return "Final Thickness (\u03bcm)"
+# Ordered (pattern, label) rules; the first match wins.
+_YLABEL_RULES = [
+    (re.compile(r"pl", re.I), "PL (nm)"),
+    (re.compile(r"(?=.*mesa)(?=.*width)", re.I | re.S), "Mesa Width (\u03bcm)"),
+    (re.compile(r"etch|depth", re.I), "Mesa Depth (\u03bcm)"),
+    (re.compile(r"thickness", re.I), "Final Thickness (\u03bcm)"),
+]
+
+@lru_cache(maxsize=512)
+def _ylabel(display_name: str, overrides: Tuple[Tuple[str, str], ...]) -> str:
+    target = display_name.strip().lower()
+    # case-insensitive exact match
+    for k, v in overrides:
+        if k.strip().lower() == target:
+            return v
+    for pattern, label in _YLABEL_RULES:
+        if pattern.search(display_name):
+            return label
     return display_name
+
+def get_ylabel(display_name: str, overrides: Optional[Dict[str, str]] = None) -> str:
+    return _ylabel(display_name, tuple(overrides.items()) if overrides else ())
+
+# ----------------- JSON files -----------------
+def json_dumps(data: Any, indent: bool = True, allow_nan: bool = False) -> bytes:
+    """
+    UTF-8 JSON bytes; orjson when installed, else the stdlib json module.
+    orjson writes inf/nan as null, so pass allow_nan=True when the data may
+    hold non-finite floats (stdlib json keeps them as Infinity/NaN).
+    """
+    if orjson is not None and not allow_nan:
+        return orjson.dumps(data, option=(orjson.OPT_INDENT_2 if indent else 0) | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+def json_loads(raw: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # e.g. Infinity/NaN written by the stdlib json module
+    return json.loads(raw)
+
+def read_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        return json_loads(f.read())
+
+def write_bytes_atomic(path: str, payload: bytes) -> None:
+    """Write to '<path>.tmp' then os.replace, so readers never see a partial file."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+def write_json_atomic(path: str, data: Any, allow_nan: bool = False) -> None:
+    write_bytes_atomic(path, json_dumps(data, allow_nan=allow_nan))
+
+def content_hash(payload: bytes) -> str:
+    """Cheap fingerprint used to skip rewriting unchanged files; xxh64 when installed."""
+    if xxhash is not None:
+        return xxhash.xxh64(payload).hexdigest()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()